@@ -4,35 +4,65 @@ Carrega `src/processed_data/indicie_de_receptividade_do_mercado.csv` e permite a
 customizar pesos e visualizar gráficos interativos.
 """
 
+from functools import partial
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 
 
+NUMERIC_COLUMNS = [
+    "empregabilidade",
+    "demanda",
+    "salario_mediana",
+    "demanda_normalizada",
+    "salario_mediana_normalizado",
+]
+
+
 @st.cache_data
 def load_data(path: Path) -> pd.DataFrame:
-    df = pd.read_csv(path, sep=";")
-    # garantir tipos
-    df["ano"] = df["ano"].astype(str)
-    # colunas numéricas
-    for col in [
-        "empregabilidade",
-        "demanda",
-        "salario_mediana",
-        "demanda_normalizada",
-        "salario_mediana_normalizado",
-    ]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    return df
+    # cópia Parquet (normalize_salario_demanda.py --parquet) já vem tipada; só é usada
+    # se não for mais antiga que o CSV
+    parquet_path = path.with_suffix(".parquet")
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= path.stat().st_mtime:
+        return pd.read_parquet(parquet_path, engine="pyarrow")
+    # tipos declarados de antemão: o leitor do pyarrow converte as colunas
+    # diretamente, sem inferência nem segunda passada com pd.to_numeric
+    try:
+        return pd.read_csv(
+            path,
+            sep=";",
+            engine="pyarrow",
+            dtype={"ano": str, **{col: "float64" for col in NUMERIC_COLUMNS}},
+        )
+    except ValueError:
+        # alguma célula não numérica (ex.: "-"): leitura tolerante, que a converte em NaN
+        df = pd.read_csv(path, sep=";")
+        df["ano"] = df["ano"].astype(str)
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        return df
+
+
+def minmax_por_ano(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Normaliza `col` para [0,1] por min-max dentro de cada ano (0 quando min == max)."""
+    g = df.groupby("ano")[col]
+    lo = g.transform("min").to_numpy()
+    rng = g.transform("max").to_numpy() - lo
+    vals = df[col].to_numpy()
+    return np.where(rng == 0, 0.0, (vals - lo) / np.where(rng == 0, 1.0, rng))
 
 
+# como em `csv_bytes`, cada entrada é um `df_indexed` inteiro (uma por combinação de
+# pesos); as tabelas derivadas, menores, ficam com o limite maior
+@st.cache_data(max_entries=4, show_spinner=False)
 def compute_index(
     df: pd.DataFrame, w_emp: float, w_dem: float, w_sal: float, use_normalized: bool
 ) -> pd.DataFrame:
-    df = df.copy()
     if (
         use_normalized
         and "demanda_normalizada" in df.columns
@@ -47,11 +77,9 @@ def compute_index(
     # normalização simples para colocar tudo na mesma escala se colunas não normalizadas forem usadas
     if dem_col == "demanda" or sal_col == "salario_mediana":
         # normaliza demanda e salario por min-max por ano
-        df["demanda_norm_tmp"] = df.groupby("ano")[dem_col].transform(
-            lambda x: (x - x.min()) / (x.max() - x.min()) if x.max() != x.min() else 0
-        )
-        df["salario_norm_tmp"] = df.groupby("ano")[sal_col].transform(
-            lambda x: (x - x.min()) / (x.max() - x.min()) if x.max() != x.min() else 0
+        df = df.assign(
+            demanda_norm_tmp=minmax_por_ano(df, dem_col),
+            salario_norm_tmp=minmax_por_ano(df, sal_col),
         )
         dem_used = "demanda_norm_tmp"
         sal_used = "salario_norm_tmp"
@@ -59,12 +87,37 @@ def compute_index(
         dem_used = dem_col
         sal_used = sal_col
 
-    df["indice_receptividade"] = (
-        w_emp * df["empregabilidade"].fillna(0)
+    return df.assign(
+        indice_receptividade=w_emp * df["empregabilidade"].fillna(0)
         + w_dem * df[dem_used].fillna(0)
         + w_sal * df[sal_used].fillna(0)
     )
-    return df
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def ranking_por_ano(df_indexed: pd.DataFrame, ano: str) -> pd.DataFrame:
+    return df_indexed[df_indexed["ano"] == ano].sort_values(
+        "indice_receptividade", ascending=False
+    )
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def pivot_indice(df_indexed: pd.DataFrame) -> pd.DataFrame:
+    # float32 é suficiente para o heatmap e reduz o payload enviado ao navegador
+    return (
+        df_indexed.pivot_table(
+            index="setor", columns="ano", values="indice_receptividade"
+        )
+        .fillna(0)
+        .astype("float32")
+    )
+
+
+# cada entrada é uma cópia codificada do dataset inteiro; o export só é gerado no clique,
+# então poucas combinações de pesos em cache bastam
+@st.cache_data(max_entries=4, show_spinner=False)
+def csv_bytes(df_indexed: pd.DataFrame) -> bytes:
+    return df_indexed.to_csv(sep=";", index=False).encode("utf-8")
 
 
 def main():
@@ -100,11 +153,12 @@ def main():
     st.sidebar.markdown("---")
     st.sidebar.write("Soma dos pesos: ", round(w_emp + w_dem + w_sal, 3))
 
-    # Filtrar dados
-    df_filtered = df[df["ano"].isin([sel_year])] if sel_setor != [] else df
-    df_filtered = df_filtered[df_filtered["setor"].isin(sel_setor)]
-
-    df_indexed = compute_index(df, w_emp, w_dem, w_sal, True)
+    # pesos arredondados à granularidade do slider para aproveitar o cache
+    df_indexed = compute_index(
+        df, round(w_emp, 2), round(w_dem, 2), round(w_sal, 2), True
+    )
+    # recorte por setor feito uma vez e reutilizado pelas séries históricas
+    df_setores = df_indexed[df_indexed["setor"].isin(sel_setor)]
 
     # Layout dos gráficos
     st.markdown("## Visão Geral")
@@ -114,11 +168,12 @@ def main():
     with col1:
         st.subheader("Evolução do Índice por Setor")
         fig_line = px.line(
-            df_indexed[df_indexed["setor"].isin(sel_setor)],
+            df_setores,
             x="ano",
             y="indice_receptividade",
             color="setor",
             markers=True,
+            render_mode="webgl",
             labels={"indice_receptividade": "Índice de Receptividade", "ano": "Ano"},
         )
         st.plotly_chart(fig_line, use_container_width=True)
@@ -130,11 +185,12 @@ def main():
     with col_emp:
         st.subheader("Empregabilidade por Setor")
         fig_emp = px.line(
-            df[df["setor"].isin(sel_setor)],
+            df_setores,
             x="ano",
             y="empregabilidade",
             color="setor",
             markers=True,
+            render_mode="webgl",
             labels={"empregabilidade": "Empregabilidade", "ano": "Ano"},
         )
         st.plotly_chart(fig_emp, use_container_width=True)
@@ -142,20 +198,19 @@ def main():
     with col_sal:
         st.subheader("Salário Mediana por Setor")
         fig_sal = px.line(
-            df[df["setor"].isin(sel_setor)],
+            df_setores,
             x="ano",
             y="salario_mediana",
             color="setor",
             markers=True,
+            render_mode="webgl",
             labels={"salario_mediana": "Salário Mediana (R$)", "ano": "Ano"},
         )
         st.plotly_chart(fig_sal, use_container_width=True)
 
     with col2:
         st.subheader(f"Ranking — Ano {sel_year}")
-        df_year = df_indexed[df_indexed["ano"] == sel_year].sort_values(
-            "indice_receptividade", ascending=False
-        )
+        df_year = ranking_por_ano(df_indexed, sel_year)
         st.dataframe(
             df_year[
                 [
@@ -183,22 +238,18 @@ def main():
 
     # Heatmap de índice (setor x ano)
     st.subheader("Heatmap: Índice por Setor e Ano")
-    pivot = df_indexed.pivot_table(
-        index="setor", columns="ano", values="indice_receptividade"
-    )
-    fig_heat = px.imshow(
-        pivot.fillna(0), labels=dict(x="Ano", y="Setor", color="Índice")
-    )
+    pivot = pivot_indice(df_indexed)
+    fig_heat = px.imshow(pivot, labels=dict(x="Ano", y="Setor", color="Índice"))
     st.plotly_chart(fig_heat, use_container_width=True)
 
     st.markdown("---")
     st.subheader("Dados brutos e download")
     st.write("Visualize e faça download dos dados com o índice calculado.")
     st.dataframe(df_indexed)
-    csv = df_indexed.to_csv(sep=";", index=False)
+    # o CSV só é gerado quando o usuário clica no botão (e fica em cache por pesos)
     st.download_button(
         "Baixar CSV com índice",
-        data=csv,
+        data=partial(csv_bytes, df_indexed),
         file_name="indice_receptividade_computado.csv",
         mime="text/csv",
     )
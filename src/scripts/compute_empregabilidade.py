@@ -15,13 +15,22 @@ O script é preparado para arquivos grandes (agregação em dicionário em memó
 from __future__ import annotations
 
 import argparse
+import codecs
 import csv
+import io
 import json
 import logging
 import sys
 from collections import defaultdict
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, Iterable, Mapping, Optional, Tuple
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
 
 
 # Logging
@@ -32,28 +41,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger("compute_empregabilidade")
 
+# buffer de E/S (1 MiB) em vez dos 8 KiB padrão: menos syscalls em arquivos grandes
+IO_BUFFER_SIZE = 1 << 20
+# tamanho de cada bloco lido pelo leitor CSV do pyarrow
+ARROW_BLOCK_SIZE = 16 << 20
+
+# nomes aceitos para cada coluna (em ordem de preferência)
+ANO_CANDIDATES = ("Ano", "ano", "ANO")
+SETOR_CANDIDATES = ("SETOR", "setor")
+NUM_EMPREGOS_CANDIDATES = (
+    "Número de empregos",
+    "Numero de empregos",
+    "numero de empregos",
+    "numero_de_empregos",
+    "num_empregos",
+)
+
 
 def open_text(path: Path, encoding: str = "utf-8"):
+    # `open()` não decodifica nada (o UnicodeDecodeError só apareceria no meio da
+    # leitura), então o encoding é decidido antes, validando o início do arquivo
+    fh = path.open("rb", buffering=IO_BUFFER_SIZE)
+    sample = fh.read(65536)
+    fh.seek(0)
     try:
-        return path.open("r", encoding=encoding, newline="")
+        # final=False: um caractere cortado no fim da amostra não conta como erro
+        codecs.getincrementaldecoder(encoding)().decode(sample)
     except UnicodeDecodeError:
         logger.warning("Falha ao abrir %s com %s; tentando latin-1", path, encoding)
-        return path.open("r", encoding="latin-1", newline="")
+        encoding = "latin-1"
+    else:
+        if encoding == "utf-8" and sample.startswith(codecs.BOM_UTF8):
+            encoding = "utf-8-sig"
+    return io.TextIOWrapper(fh, encoding=encoding, newline="")
 
 
 def normalize_header(h: str) -> str:
     return h.strip().lower()
 
 
-def choose_column(
-    fieldnames: Iterable[str], candidates: Iterable[str]
-) -> Optional[str]:
-    norm_map = {normalize_header(fn): fn for fn in fieldnames}
-    for cand in candidates:
-        real = norm_map.get(normalize_header(cand))
-        if real:
-            return real
-    return None
+def resolve_columns(
+    fieldnames: Sequence[str], spec: Mapping[str, Iterable[str]]
+) -> Dict[str, int]:
+    """
+    Resolve a posição de cada coluna de `spec` (nome lógico -> candidatos, em ordem de
+    preferência) normalizando o header uma única vez. Colunas não encontradas ficam de
+    fora do resultado.
+    """
+    positions = {normalize_header(fn): i for i, fn in enumerate(fieldnames)}
+    found: Dict[str, int] = {}
+    for key, candidates in spec.items():
+        for cand in candidates:
+            idx = positions.get(normalize_header(cand))
+            if idx is not None:
+                found[key] = idx
+                break
+    return found
 
 
 def load_desocupacao(path: Path) -> Dict[str, float]:
@@ -71,93 +114,236 @@ def load_desocupacao(path: Path) -> Dict[str, float]:
     return result
 
 
+def parse_num_empregos(value: str) -> Optional[float]:
+    """
+    Converte o campo "Número de empregos" para float; retorna None se não for possível.
+
+    Espaços ao redor são aceitos pelo próprio `float`, então o caso comum não passa por
+    `strip()`; aspas residuais só são removidas quando a conversão direta falha.
+    """
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        pass
+    if '"' in value:
+        return parse_num_empregos(value.replace('"', ""))
+    # tenta remover possíveis separadores de milhar
+    try:
+        return float(value.replace(".", "").replace(",", "."))
+    except ValueError:
+        return None
+
+
+def strip_keys(counts: Mapping[Tuple[str, str], float]) -> Dict[Tuple[str, str], float]:
+    """
+    Aplica `strip()` a ano e setor uma vez por chave distinta, em vez de uma vez por linha.
+
+    Chaves que passam a coincidir são somadas; chaves com ano ou setor vazios são
+    descartadas, como já acontecia com as linhas correspondentes.
+    """
+    result: Dict[Tuple[str, str], float] = defaultdict(float)
+    for (ano, setor), value in counts.items():
+        key = (ano.strip(), setor.strip())
+        if key[0] and key[1]:
+            result[key] += value
+    return result
+
+
+def parse_num_empregos_series(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Versão vetorizada de `parse_num_empregos`: retorna `(valores, convertidos)`.
+
+    `convertidos` é falso onde a conversão falha; um "nan" literal é convertido (para
+    NaN), como no `float`. O caso comum passa só pelo `pd.to_numeric`; as linhas que ele
+    não converte caem em `parse_num_empregos`, então as regras são exatamente as mesmas.
+    """
+    present = values.notna()
+    values = values.astype(str)
+    result = pd.to_numeric(values.str.replace(",", ".", regex=False), errors="coerce")
+    converted = result.notna()
+    # campos vazios (ausentes) não são convertidos
+    failed = present & ~converted
+    if failed.any():
+        retry = [parse_num_empregos(v) for v in values[failed].tolist()]
+        converted[failed] = [v is not None for v in retry]
+        result[failed] = [np.nan if v is None else v for v in retry]
+    return result, converted
+
+
+def parse_num_empregos_array(values: pa.Array) -> Tuple[pa.Array, pa.Array]:
+    """
+    Como `parse_num_empregos_series`, para uma coluna de texto do pyarrow.
+
+    O caso comum é um único `cast` para float64 (que aceita exatamente o que o `float`
+    aceita, ou falha); só os blocos em que ele falha passam pela conversão tolerante.
+    """
+    try:
+        num = pc.cast(pc.replace_substring(values, ",", "."), pa.float64())
+    except pa.ArrowInvalid:
+        num, converted = parse_num_empregos_series(values.to_pandas())
+        # via numpy: um "nan" convertido continua NaN em vez de virar nulo
+        return pa.array(num.to_numpy(), pa.float64()), pa.array(converted.to_numpy())
+    # nulo aqui só vem de campo vazio
+    return num, pc.is_valid(num)
+
+
 def aggregate_empregos(
-    rais_path: Path, report_every: int = 100_000
+    rais_path: Path, report_every: int = 500_000
 ) -> Dict[Tuple[str, str], float]:
+    """
+    Soma o número de empregos por (ano, setor).
+
+    O arquivo é lido em lotes pelo leitor CSV do pyarrow, só com as três colunas usadas;
+    cada lote é agregado com `group_by().aggregate()` e somado ao acumulado. As regras
+    são as do `csv.reader`: só o campo vazio é ausente ("NA", "null"... são texto), um
+    "nan" contamina a soma da chave e linhas com número de colunas diferente do header
+    são repassadas ao csv.
+    """
     logger.info("Agregando empregados por Ano+SETOR de: %s", rais_path)
     counts: Dict[Tuple[str, str], float] = defaultdict(float)
     with open_text(rais_path) as fh:
-        reader = csv.DictReader(fh, delimiter=";")
-        if reader.fieldnames is None:
-            raise ValueError(f"Arquivo {rais_path} não tem header reconhecível")
-
-        ano_col = choose_column(reader.fieldnames, ("Ano", "ano", "ANO"))
-        setor_col = choose_column(reader.fieldnames, ("SETOR", "setor"))
-        num_emp_col = choose_column(
-            reader.fieldnames,
-            (
-                "Número de empregos",
-                "Numero de empregos",
-                "numero de empregos",
-                "numero_de_empregos",
-                "num_empregos",
-            ),
+        # arquivo vazio resulta em header [] e cai no erro de colunas abaixo
+        header = next(csv.reader([fh.readline()], delimiter=";"))
+        # o pyarrow já descarta o BOM do utf-8
+        encoding = "utf-8" if fh.encoding == "utf-8-sig" else fh.encoding
+
+    spec = {
+        "ano": ANO_CANDIDATES,
+        "setor": SETOR_CANDIDATES,
+        "num_emp": NUM_EMPREGOS_CANDIDATES,
+    }
+    cols = resolve_columns(header, spec)
+
+    if len(cols) < len(spec):
+        logger.error(
+            "Colunas esperadas não encontradas no arquivo rais_com_cnaes_setor.csv. Encontradas: %s",
+            header,
         )
+        raise SystemExit(1)
+
+    idx_ano, idx_setor, idx_num_emp = cols["ano"], cols["setor"], cols["num_emp"]
+    min_width = max(idx_ano, idx_setor, idx_num_emp) + 1
+    # nomes posicionais: o header já foi lido, e nomes repetidos não atrapalham
+    names = [f"c{i}" for i in range(len(header))]
+    used = [names[idx_ano], names[idx_setor], names[idx_num_emp]]
+
+    # linhas com mais ou menos colunas que o header (o pyarrow não as aceita)
+    odd_rows: List[str] = []
+
+    def keep_odd_row(row) -> str:
+        odd_rows.append(row.text)
+        return "skip"
+
+    reader = pv.open_csv(
+        rais_path,
+        read_options=pv.ReadOptions(
+            encoding=encoding,
+            skip_rows=1,
+            column_names=names,
+            block_size=ARROW_BLOCK_SIZE,
+        ),
+        parse_options=pv.ParseOptions(
+            delimiter=";", newlines_in_values=True, invalid_row_handler=keep_odd_row
+        ),
+        convert_options=pv.ConvertOptions(
+            include_columns=used,
+            column_types={name: pa.string() for name in used},
+            # só o campo vazio é ausente, como no csv.reader
+            null_values=[""],
+            strings_can_be_null=True,
+        ),
+    )
 
-        if ano_col is None or setor_col is None or num_emp_col is None:
-            logger.error(
-                "Colunas esperadas não encontradas no arquivo rais_com_cnaes_setor.csv. Encontradas: %s",
-                reader.fieldnames,
+    processed = 0
+    next_report = report_every
+    for batch in reader:
+        processed += batch.num_rows
+        ano, setor, num_raw = (batch.column(name) for name in used)
+        num_emp, converted = parse_num_empregos_array(num_raw)
+        # linhas sem ano/setor ou com número de empregos ilegível não contam nem criam
+        # a chave; um NaN convertido contamina a soma, como na soma com float
+        keep = pc.and_(pc.and_(pc.is_valid(ano), pc.is_valid(setor)), converted)
+        partial_counts = (
+            pa.table({"ano": ano, "setor": setor, "num_emp": num_emp})
+            .filter(keep)
+            .group_by(["ano", "setor"])
+            .aggregate([("num_emp", "sum")])
+        )
+        for key_ano, key_setor, value in zip(
+            partial_counts.column("ano").to_pylist(),
+            partial_counts.column("setor").to_pylist(),
+            partial_counts.column("num_emp_sum").to_pylist(),
+        ):
+            counts[(key_ano, key_setor)] += value
+        if processed >= next_report:
+            next_report = processed + report_every
+            logger.info(
+                "Linhas processadas: %d; chaves distintas: %d",
+                processed,
+                len(counts),
             )
-            raise SystemExit(1)
-
-        processed = 0
-        for row in reader:
-            processed += 1
-            ano = row.get(ano_col, "").strip()
-            setor = row.get(setor_col, "").strip()
-            num_emp_raw = row.get(num_emp_col, "").strip().replace('"', "")
-            if not ano or not setor or not num_emp_raw:
-                # ignore incomplete rows but log occasionally
-                if processed % (report_every * 10) == 0:
-                    logger.warning(
-                        "Linhas incompletas encontradas (ex.: ano/setor/num_emp vazio) na linha %d",
-                        processed,
-                    )
-                continue
-            try:
-                num_emp = float(num_emp_raw.replace(",", "."))
-            except ValueError:
-                # tenta remover possíveis separadores de milhar
-                try:
-                    num_emp = float(num_emp_raw.replace(".", "").replace(",", "."))
-                except ValueError:
-                    logger.debug(
-                        "Não foi possível converter número de empregos: %s (linha %d)",
-                        num_emp_raw,
-                        processed,
-                    )
-                    continue
 
+    for row in csv.reader(odd_rows, delimiter=";"):
+        if len(row) < min_width:
+            # linha vazia ou truncada
+            continue
+        processed += 1
+        ano, setor, num_emp_raw = row[idx_ano], row[idx_setor], row[idx_num_emp]
+        if not ano or not setor or not num_emp_raw:
+            continue
+        num_emp = parse_num_empregos(num_emp_raw)
+        if num_emp is not None:
             counts[(ano, setor)] += num_emp
-            if processed % report_every == 0:
-                logger.info(
-                    "Linhas processadas: %d; chaves distintas: %d",
-                    processed,
-                    len(counts),
-                )
 
+    counts = strip_keys(counts)
     logger.info("Agregação concluída. Total de chaves (ano,setor): %d", len(counts))
     return counts
 
 
-def calc_empregabilidade(empregados: float, taxa: float) -> float:
-    # protege contra taxa >= 100
-    if taxa >= 100.0:
+def calc_empregabilidade_array(empregados: np.ndarray, taxas: np.ndarray) -> np.ndarray:
+    """
+    Calcula a empregabilidade de cada posição de `empregados` com a taxa de desocupação
+    (em %) correspondente de `taxas`.
+
+    empregabilidade = empregados / (empregados + desempregados), com desempregados
+    estimados como empregados * (taxa / (100 - taxa)). Resulta 0.0 quando o total é
+    zero ou a taxa é >= 100; contagens NaN/inf resultam em NaN.
+    """
+    invalid = taxas >= 100.0
+    if invalid.any():
         logger.warning(
-            "Taxa de desocupação >= 100%% (%s). Retornando empregabilidade 0.0", taxa
+            "Taxa de desocupação >= 100%% em %d chave(s). Retornando empregabilidade 0.0",
+            int(invalid.sum()),
         )
-        return 0.0
-    # desempregados = empregados * (taxa/(100 - taxa))
-    denom = 100.0 - taxa
-    if denom == 0:
-        logger.warning("Denominador zero para taxa %s; retornando 0", taxa)
-        return 0.0
-    desempregados = empregados * (taxa / denom)
-    total = empregados + desempregados
-    if total == 0:
-        return 0.0
-    return empregados / total
+    # mesma sequência de operações da fórmula escalar (mesmo arredondamento); as
+    # posições inválidas são descartadas pelo `where`
+    with np.errstate(divide="ignore", invalid="ignore"):
+        desempregados = empregados * (taxas / (100.0 - taxas))
+        total = empregados + desempregados
+        return np.where(invalid | (total == 0), 0.0, empregados / total)
+
+
+def compute_results(
+    counts: Mapping[Tuple[str, str], float], taxas: Mapping[str, float]
+) -> Dict[Tuple[str, str], float]:
+    """Aplica a taxa de desocupação do ano a cada chave (ano, setor) agregada."""
+    missing_taxas = {ano for ano, _ in counts if str(ano) not in taxas}
+    # pulamos as chaves sem taxa para manter consistência
+    keys = [key for key in counts if key[0] not in missing_taxas]
+    empregados = np.fromiter(
+        (counts[key] for key in keys), dtype=np.float64, count=len(keys)
+    )
+    taxa = np.fromiter(
+        (taxas[str(key[0])] for key in keys), dtype=np.float64, count=len(keys)
+    )
+    results = dict(zip(keys, calc_empregabilidade_array(empregados, taxa).tolist()))
+
+    if missing_taxas:
+        logger.warning(
+            "Taxas ausentes para anos: %s. Essas combinações foram ignoradas.",
+            sorted(missing_taxas),
+        )
+    return results
 
 
 def write_output(out_path: Path, results: Dict[Tuple[str, str], float]):
@@ -165,9 +351,7 @@ def write_output(out_path: Path, results: Dict[Tuple[str, str], float]):
         writer = csv.writer(fh, delimiter=";")
         writer.writerow(["ano", "setor", "empregabilidade"])
         # sort by ano then setor for deterministic output
-        for (ano, setor), empreg in sorted(
-            results.items(), key=lambda kv: (kv[0][0], kv[0][1])
-        ):
+        for (ano, setor), empreg in sorted(results.items(), key=itemgetter(0)):
             writer.writerow([ano, setor, f"{empreg:.6f}"])
 
 
@@ -181,7 +365,10 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--desemp", required=True, help="Arquivo desocupacao.json")
     p.add_argument("--out", required=True, help="Arquivo de saída (separador ;)")
     p.add_argument(
-        "--report-every", type=int, default=100_000, help="Frequência de log em linhas"
+        "--report-every",
+        type=int,
+        default=500_000,
+        help="Linhas por bloco lido (o progresso é logado a cada bloco)",
     )
     return p.parse_args()
 
@@ -202,23 +389,7 @@ def main() -> None:
     taxas = load_desocupacao(desemp_path)
     counts = aggregate_empregos(rais_path, report_every=args.report_every)
 
-    results: Dict[Tuple[str, str], float] = {}
-    missing_taxas = set()
-    for (ano, setor), empregados in counts.items():
-        taxa = taxas.get(str(ano))
-        if taxa is None:
-            missing_taxas.add(ano)
-            # pulamos esta chave para manter consistência
-            continue
-        empreg = calc_empregabilidade(empregados, taxa)
-        results[(ano, setor)] = empreg
-
-    if missing_taxas:
-        logger.warning(
-            "Taxas ausentes para anos: %s. Essas combinações foram ignoradas.",
-            sorted(missing_taxas),
-        )
-
+    results = compute_results(counts, taxas)
     write_output(out_path, results)
     logger.info("Arquivo gerado: %s (linhas: %d)", out_path, len(results))
 
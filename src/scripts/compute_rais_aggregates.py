@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lê `data/rais_com_cnaes_setor.csv` uma única vez e gera, na mesma passada, as saídas de
+`compute_empregabilidade.py` e `compute_salario_medio_setor.py`:
+
+  - empregabilidade por ano+setor (ano;setor;empregabilidade)
+  - mediana do Salário Médio por ano+setor (ano;setor;salario_mediana)
+
+Os dois scripts originais continuam funcionando de forma independente; este driver evita
+ler e decodificar o mesmo arquivo (potencialmente de vários GB) duas vezes.
+
+Uso:
+  python compute_rais_aggregates.py --rais data/rais_com_cnaes_setor.csv --desemp data/desocupacao.json \\
+      --out-empregabilidade data/empregabilidade_por_setor.csv --out-salario data/salario_medio_por_setor.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+import sys
+from array import array
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+from typing import Dict, Tuple
+
+from compute_empregabilidade import (
+    ANO_CANDIDATES,
+    NUM_EMPREGOS_CANDIDATES,
+    SETOR_CANDIDATES,
+    compute_results,
+    load_desocupacao,
+    open_text,
+    parse_num_empregos,
+    resolve_columns,
+    strip_keys as strip_counts,
+    write_output,
+)
+from compute_salario_medio_setor import (
+    SALARIO_CANDIDATES,
+    compute_medians,
+    parse_decimal,
+    strip_keys as strip_bins,
+    write_medians,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)],
+)
+logger = logging.getLogger("compute_rais_aggregates")
+
+
+def aggregate_rais(
+    rais_path: Path, report_every: int = 100_000, include_zeros: bool = False
+) -> Tuple[Dict[Tuple[str, str], float], Dict[Tuple[str, str], float]]:
+    """
+    Percorre o arquivo uma vez e retorna `(empregos, medianas)` por (ano, setor).
+
+    As regras de cada agregação são as mesmas dos scripts individuais: linhas sem número
+    de empregos não contam para a soma, e salários zerados são ignorados na mediana a
+    menos que `include_zeros` seja verdadeiro.
+    """
+    logger.info("Agregando empregos e salários por Ano+SETOR de: %s", rais_path)
+    counts: Dict[Tuple[str, str], float] = defaultdict(float)
+    bins: Dict[Tuple[str, str], array[float]] = defaultdict(partial(array, "d"))
+
+    with open_text(rais_path) as fh:
+        reader = csv.reader(fh, delimiter=";")
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"Arquivo {rais_path} não tem header reconhecível")
+
+        spec = {
+            "ano": ANO_CANDIDATES,
+            "setor": SETOR_CANDIDATES,
+            "num_emp": NUM_EMPREGOS_CANDIDATES,
+            "salario": SALARIO_CANDIDATES,
+        }
+        # índices resolvidos uma vez a partir do header; o loop só indexa a lista
+        cols = resolve_columns(header, spec)
+
+        if len(cols) < len(spec):
+            logger.error("Colunas esperadas não encontradas. Encontradas: %s", header)
+            raise SystemExit(1)
+
+        idx_ano = cols["ano"]
+        idx_setor = cols["setor"]
+        idx_num_emp = cols["num_emp"]
+        idx_salario = cols["salario"]
+        min_width = max(idx_ano, idx_setor, idx_num_emp, idx_salario) + 1
+
+        processed = 0
+        for row in reader:
+            if len(row) < min_width:
+                # linha vazia ou truncada
+                continue
+            processed += 1
+            # valores crus: a limpeza das chaves é feita depois, por chave distinta
+            ano = row[idx_ano]
+            setor = row[idx_setor]
+            if not ano or not setor:
+                continue
+            key = (ano, setor)
+
+            num_emp_raw = row[idx_num_emp]
+            if num_emp_raw:
+                num_emp = parse_num_empregos(num_emp_raw)
+                if num_emp is not None:
+                    counts[key] += num_emp
+
+            salario = parse_decimal(row[idx_salario])
+            if include_zeros or salario != 0.0:
+                bins[key].append(salario)
+
+            if processed % report_every == 0:
+                logger.info(
+                    "Linhas processadas: %d; chaves distintas: %d",
+                    processed,
+                    len(counts),
+                )
+
+    counts = strip_counts(counts)
+    medians = compute_medians(strip_bins(bins))
+    logger.info(
+        "Agregação concluída. Chaves (empregos): %d; chaves (salário): %d",
+        len(counts),
+        len(medians),
+    )
+    return counts, medians
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Calcula empregabilidade e salário mediano por ano e setor em uma única leitura"
+    )
+    p.add_argument(
+        "--rais", required=True, help="Arquivo rais_com_cnaes_setor.csv (separador ;)"
+    )
+    p.add_argument("--desemp", required=True, help="Arquivo desocupacao.json")
+    p.add_argument(
+        "--out-empregabilidade",
+        required=True,
+        help="Arquivo de saída da empregabilidade (separador ;)",
+    )
+    p.add_argument(
+        "--out-salario",
+        required=True,
+        help="Arquivo de saída do salário mediano (separador ;)",
+    )
+    p.add_argument(
+        "--report-every", type=int, default=100_000, help="Frequência de log em linhas"
+    )
+    p.add_argument(
+        "--include-zeros",
+        action="store_true",
+        help="Incluir salários iguais a zero ao calcular a mediana",
+    )
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    rais_path = Path(args.rais)
+    desemp_path = Path(args.desemp)
+
+    if not rais_path.exists():
+        logger.error("Arquivo rais não encontrado: %s", rais_path)
+        raise SystemExit(1)
+    if not desemp_path.exists():
+        logger.error("Arquivo desocupacao não encontrado: %s", desemp_path)
+        raise SystemExit(1)
+
+    taxas = load_desocupacao(desemp_path)
+    counts, medians = aggregate_rais(
+        rais_path, report_every=args.report_every, include_zeros=args.include_zeros
+    )
+
+    results = compute_results(counts, taxas)
+    out_emp = Path(args.out_empregabilidade)
+    write_output(out_emp, results)
+    logger.info("Arquivo gerado: %s (linhas: %d)", out_emp, len(results))
+
+    out_sal = Path(args.out_salario)
+    write_medians(out_sal, medians)
+    logger.info("Arquivo gerado: %s (linhas: %d)", out_sal, len(medians))
+
+
+if __name__ == "__main__":
+    main()
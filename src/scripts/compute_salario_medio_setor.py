@@ -7,9 +7,10 @@ Agrega o campo "Salário Médio" por Ano e SETOR a partir de
 - Entrada: CSV separado por `;` com colunas contendo Ano, SETOR e Salário Médio.
 - Saída: CSV separado por `;` com colunas: ano;setor;salario_mediana
 
-O script é preparado para arquivos grandes: faz leitura em streaming e acumula listas
-de valores por chave (ano,setor) para calcular a mediana no final. Isso assume que
-o número de combinações (ano,setor) é bem menor que o número de linhas; caso contrário
+O script é preparado para arquivos grandes: faz leitura em streaming e acumula arrays
+compactos (`array('d')`) de valores por chave (ano,setor) para calcular a mediana no
+final. Isso assume que o número de combinações (ano,setor) é bem menor que o número
+de linhas; caso contrário
 podemos adaptar para um algoritmo streaming por chave (dois heaps por chave).
 """
 
@@ -19,10 +20,23 @@ import argparse
 import csv
 import logging
 import sys
+from array import array
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, Tuple
-import statistics
+from typing import Dict, Mapping, Tuple
+
+import numpy as np
+
+# leitura e detecção de colunas compartilhadas com compute_empregabilidade (mesma pasta)
+from compute_empregabilidade import (
+    ANO_CANDIDATES,
+    SETOR_CANDIDATES,
+    open_text,
+    resolve_columns,
+)
 
 # logging
 logging.basicConfig(
@@ -32,26 +46,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger("compute_salario_medio_setor")
 
-
-def open_text(path: Path, encoding: str = "utf-8"):
-    try:
-        return path.open("r", encoding=encoding, newline="")
-    except UnicodeDecodeError:
-        logger.warning("Falha ao abrir %s com %s; tentando latin-1", path, encoding)
-        return path.open("r", encoding="latin-1", newline="")
-
-
-def normalize_header(h: str) -> str:
-    return h.strip().lower()
+# nomes aceitos para a coluna de salário (em ordem de preferência)
+SALARIO_CANDIDATES = (
+    "Salário Médio",
+    "Salario Medio",
+    "salario medio",
+    "salario_medio",
+    "Salário Medio",
+)
 
 
-def choose_column(fieldnames, candidates):
-    norm_map = {normalize_header(fn): fn for fn in fieldnames}
-    for cand in candidates:
-        real = norm_map.get(normalize_header(cand))
-        if real:
-            return real
-    return None
+# remove pontos de milhar e troca vírgula decimal por ponto em uma só chamada
+_BR_DECIMAL = str.maketrans({".": None, ",": "."})
 
 
 def parse_decimal(value: str) -> float:
@@ -61,66 +67,117 @@ def parse_decimal(value: str) -> float:
     """
     if value is None:
         return 0.0
-    s = value.strip()
-    if s == "":
-        return 0.0
-    # remove possíveis aspas
-    s = s.replace('"', "")
-    # primeiro tenta forma direta com ponto decimal
-    try:
-        return float(s)
-    except ValueError:
-        pass
-    # substitui vírgula por ponto (caso 1234,56)
+    # caminho rápido: forma direta com ponto decimal (float já ignora espaços ao redor)
     try:
-        return float(s.replace(",", "."))
+        return float(value)
     except ValueError:
         pass
-    # tenta remover separadores de milhar (pontos) e trocar vírgula por ponto
+    if not value or value.isspace():
+        return 0.0
+    # remove possíveis aspas
+    if '"' in value:
+        value = value.replace('"', "")
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    # vírgula decimal com ou sem pontos de milhar ('1234,56', '1.234,56', '1.234');
+    # cobre as tentativas antigas de trocar só a vírgula e de remover os pontos
     try:
-        return float(s.replace(".", "").replace(",", "."))
+        return float(value.translate(_BR_DECIMAL))
     except ValueError:
         logger.debug("Não foi possível converter valor numérico: %s", value)
         return 0.0
 
 
+def strip_keys(
+    bins: Mapping[Tuple[str, str], array[float]],
+) -> Dict[Tuple[str, str], array[float]]:
+    """
+    Aplica `strip()` a ano e setor uma vez por chave distinta, em vez de uma vez por linha.
+
+    Valores de chaves que passam a coincidir são concatenados; chaves com ano ou setor
+    vazios são descartadas, como já acontecia com as linhas correspondentes.
+    """
+    result: Dict[Tuple[str, str], array[float]] = {}
+    for (ano, setor), values in bins.items():
+        key = (ano.strip(), setor.strip())
+        if not key[0] or not key[1]:
+            continue
+        if key in result:
+            result[key].extend(values)
+        else:
+            result[key] = values
+    return result
+
+
+def median(values: np.ndarray) -> float:
+    """Mediana via `np.partition` (seleção O(n), sem ordenar o array inteiro); 0.0 se vazio."""
+    n = values.size
+    if n == 0:
+        return 0.0
+    k = n // 2
+    if n % 2 == 1:
+        return float(np.partition(values, k)[k])
+    part = np.partition(values, (k - 1, k))
+    return float((part[k - 1] + part[k]) / 2.0)
+
+
+def compute_medians(
+    bins: Mapping[Tuple[str, str], array[float]],
+) -> Dict[Tuple[str, str], float]:
+    """
+    Calcula a mediana dos valores acumulados para cada chave (ano, setor).
+
+    `np.partition` libera o GIL durante a seleção, então as chaves são processadas
+    em paralelo por um pool de threads (uma tarefa por chave).
+    """
+    keys = list(bins)
+    # `array('d')` já guarda doubles contíguos: frombuffer não copia os dados
+    arrays = [np.frombuffer(bins[key], dtype=np.float64) for key in keys]
+    with ThreadPoolExecutor() as pool:
+        return dict(zip(keys, pool.map(median, arrays)))
+
+
 def aggregate_median(
     rais_path: Path, report_every: int = 100_000, include_zeros: bool = False
 ) -> Dict[Tuple[str, str], float]:
     """Agrega listas do campo Salário Médio por (ano, setor) e retorna a mediana por chave."""
     logger.info("Agregando mediana do Salário Médio por Ano+SETOR de: %s", rais_path)
-    bins = defaultdict(list)  # type: ignore
+    # valores empacotados como double C (8 bytes/valor) em vez de lista de floats Python
+    bins: Dict[Tuple[str, str], array[float]] = defaultdict(partial(array, "d"))
 
     with open_text(rais_path) as fh:
-        reader = csv.DictReader(fh, delimiter=";")
-        if reader.fieldnames is None:
+        reader = csv.reader(fh, delimiter=";")
+        header = next(reader, None)
+        if header is None:
             raise ValueError(f"Arquivo {rais_path} não tem header reconhecível")
 
-        ano_col = choose_column(reader.fieldnames, ("Ano", "ano", "ANO"))
-        setor_col = choose_column(reader.fieldnames, ("SETOR", "setor"))
-        salario_col = choose_column(
-            reader.fieldnames,
-            (
-                "Salário Médio",
-                "Salario Medio",
-                "salario medio",
-                "salario_medio",
-                "Salário Medio",
-            ),
-        )
-
-        if not ano_col or not setor_col or not salario_col:
-            logger.error(
-                "Colunas esperadas não encontradas. Encontradas: %s", reader.fieldnames
-            )
+        spec = {
+            "ano": ANO_CANDIDATES,
+            "setor": SETOR_CANDIDATES,
+            "salario": SALARIO_CANDIDATES,
+        }
+        # índices resolvidos uma vez a partir do header; o loop só indexa a lista
+        cols = resolve_columns(header, spec)
+
+        if len(cols) < len(spec):
+            logger.error("Colunas esperadas não encontradas. Encontradas: %s", header)
             raise SystemExit(1)
 
+        idx_ano, idx_setor, idx_salario = cols["ano"], cols["setor"], cols["salario"]
+        min_width = max(idx_ano, idx_setor, idx_salario) + 1
+
         processed = 0
         for row in reader:
+            if len(row) < min_width:
+                # linha vazia ou truncada
+                continue
             processed += 1
-            ano = row.get(ano_col, "").strip()
-            setor = row.get(setor_col, "").strip()
-            salario_raw = row.get(salario_col, "")
+            # valores crus: a limpeza das chaves é feita depois, por chave distinta
+            ano = row[idx_ano]
+            setor = row[idx_setor]
+            salario_raw = row[idx_salario]
             if not ano or not setor:
                 # ignora linhas sem ano ou setor
                 continue
@@ -137,24 +194,7 @@ def aggregate_median(
                     "Linhas processadas: %d; chaves distintas: %d", processed, len(bins)
                 )
 
-    # calcula medianas
-    medians: Dict[Tuple[str, str], float] = {}
-    for key, values in bins.items():
-        if not values:
-            medians[key] = 0.0
-            continue
-        try:
-            medians[key] = float(statistics.median(values))
-        except Exception:
-            # fallback: sort and compute manually
-            vals = sorted(values)
-            n = len(vals)
-            mid = n // 2
-            if n % 2 == 1:
-                medians[key] = float(vals[mid])
-            else:
-                medians[key] = float((vals[mid - 1] + vals[mid]) / 2.0)
-
+    medians = compute_medians(strip_keys(bins))
     logger.info("Agregação concluída. Chaves: %d", len(medians))
     return medians
 
@@ -164,9 +204,17 @@ def write_output(out_path: Path, means: Dict[Tuple[str, str], float]):
     with out_path.open("w", encoding="utf-8", newline="") as fh:
         writer = csv.writer(fh, delimiter=";")
         writer.writerow(["ano", "setor", "salario_medio"])
-        for (ano, setor), avg in sorted(
-            means.items(), key=lambda kv: (kv[0][0], kv[0][1])
-        ):
+        for (ano, setor), avg in sorted(means.items(), key=itemgetter(0)):
+            writer.writerow([ano, setor, f"{avg:.6f}"])
+
+
+def write_medians(out_path: Path, medians: Dict[Tuple[str, str], float]):
+    """Como `write_output`, mas com header 'salario_mediana'."""
+    logger.info("Escrevendo resultado em: %s", out_path)
+    with out_path.open("w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh, delimiter=";")
+        writer.writerow(["ano", "setor", "salario_mediana"])
+        for (ano, setor), avg in sorted(medians.items(), key=itemgetter(0)):
             writer.writerow([ano, setor, f"{avg:.6f}"])
 
 
@@ -201,15 +249,7 @@ def main() -> None:
     medians = aggregate_median(
         rais_path, report_every=args.report_every, include_zeros=args.include_zeros
     )
-    # Reusa write_output, mas altera header para 'salario_mediana'
-    logger.info("Escrevendo resultado em: %s", out_path)
-    with out_path.open("w", encoding="utf-8", newline="") as fh:
-        writer = csv.writer(fh, delimiter=";")
-        writer.writerow(["ano", "setor", "salario_mediana"])
-        for (ano, setor), avg in sorted(
-            medians.items(), key=lambda kv: (kv[0][0], kv[0][1])
-        ):
-            writer.writerow([ano, setor, f"{avg:.6f}"])
+    write_medians(out_path, medians)
 
     logger.info("Arquivo gerado: %s (linhas: %d)", out_path, len(medians))
 
@@ -12,19 +12,31 @@ import os
 from pathlib import Path
 
 
-def extrair_cnaes_unicos(arquivo_entrada: str, arquivo_saida: str) -> None:
+def extrair_cnaes_unicos(
+    arquivo_entrada: str, arquivo_saida: str, chunksize: int = 500_000
+) -> None:
     """
     Extrai CNAEs únicos de um arquivo CSV.
 
+    O arquivo é lido em blocos de `chunksize` linhas e cada bloco é deduplicado antes
+    de ser guardado, de modo que só os CNAEs distintos de cada bloco ficam em memória
+    (e não todas as linhas do arquivo).
+
     Args:
         arquivo_entrada: Caminho para o arquivo CSV de entrada
         arquivo_saida: Caminho para o arquivo CSV de saída
+        chunksize: Número de linhas lidas por bloco
     """
     print(f"Lendo arquivo: {arquivo_entrada}")
 
-    df = pd.read_csv(arquivo_entrada, usecols=["CNAE", "ID CNAE"], sep=";")
+    partes = [
+        chunk.drop_duplicates(subset=["ID CNAE"])
+        for chunk in pd.read_csv(
+            arquivo_entrada, usecols=["CNAE", "ID CNAE"], sep=";", chunksize=chunksize
+        )
+    ]
 
-    df_unicos = df.drop_duplicates(subset=["ID CNAE"])
+    df_unicos = pd.concat(partes).drop_duplicates(subset=["ID CNAE"])
 
     df_unicos = df_unicos.sort_values(by=["ID CNAE"])
 
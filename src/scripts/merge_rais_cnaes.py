@@ -28,11 +28,19 @@ O script tenta abrir arquivos em UTF-8 e, em caso de falha, em latin-1.
 from __future__ import annotations
 
 import argparse
+import codecs
 import csv
+import io
 import logging
+import mmap
+import os
+import shutil
 import sys
+from itertools import chain
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Dict, Iterable, Mapping, Optional, Tuple
+from tempfile import TemporaryDirectory
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
 
 
 # --- Configuração de logging -------------------------------------------------
@@ -43,17 +51,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger("merge_rais_cnaes")
 
+# buffer de E/S (1 MiB) em vez dos 8 KiB padrão: menos syscalls em arquivos grandes
+IO_BUFFER_SIZE = 1 << 20
+
 
 # --- Utilities ---------------------------------------------------------------
 
 
 def open_text(path: Path, encoding: str = "utf-8"):
-    """Abre um arquivo de texto tentando UTF-8 e caindo para latin-1 se necessário."""
+    """Abre um arquivo de texto em UTF-8, caindo para latin-1 se o início não for UTF-8 válido."""
+    # `open()` não decodifica nada (o UnicodeDecodeError só apareceria no meio da
+    # leitura), então o encoding é decidido antes, validando o início do arquivo
+    fh = path.open("rb", buffering=IO_BUFFER_SIZE)
+    sample = fh.read(65536)
+    fh.seek(0)
     try:
-        return path.open("r", encoding=encoding, newline="")
+        # final=False: um caractere cortado no fim da amostra não conta como erro
+        codecs.getincrementaldecoder(encoding)().decode(sample)
     except UnicodeDecodeError:
         logger.warning("Falha ao abrir %s com %s; tentando latin-1", path, encoding)
-        return path.open("r", encoding="latin-1", newline="")
+        encoding = "latin-1"
+    else:
+        if encoding == "utf-8" and sample.startswith(codecs.BOM_UTF8):
+            encoding = "utf-8-sig"
+    return io.TextIOWrapper(fh, encoding=encoding, newline="")
 
 
 def normalize_header(h: str) -> str:
@@ -73,6 +94,13 @@ def choose_column(
     return None
 
 
+def write_all(fd: int, data: bytes) -> None:
+    """Grava `data` inteiro em `fd` com `os.write` (que pode gravar só parte por chamada)."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
 # --- Carregamento do mapa SETOR por ID CNAE ---------------------------------
 
 
@@ -115,14 +143,279 @@ def load_cnaes_unicos(
             key = row.get(id_col, "").strip()
             if not key:
                 continue
-            mapping[key] = row.get(setor_col, "").strip()
+            # poucos setores distintos para muitos códigos: uma única str por setor
+            mapping[key] = sys.intern(row.get(setor_col, "").strip())
 
     logger.info("CNAEs carregados: %d", len(mapping))
     return mapping
 
 
+class SortedCnaesLookup:
+    """
+    Alternativa a `load_cnaes_unicos` para quando `cnaes_unicos.csv` e o rais estão
+    ordenados por ID CNAE: em vez de manter o mapa inteiro em memória, avança um
+    cursor sobre o arquivo de CNAEs junto com as consultas (sort-merge join).
+
+    Expõe `get(id_cnae, default)` como um dict, então pode ser passado a `stream_merge`
+    no lugar do mapa. As consultas precisam vir em ordem não decrescente; arquivos fora
+    de ordem levantam ValueError. Com IDs repetidos vale o último, como no dict.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        id_cnae_candidates: Tuple[str, ...] = ("ID CNAE", "id_cnae", "id cnae"),
+        setor_candidates: Tuple[str, ...] = ("SETOR", "setor"),
+    ) -> None:
+        self.path = Path(path)
+        logger.info("Lendo CNAEs únicos ordenados de: %s", self.path)
+        self._fh = open_text(self.path)
+        reader = csv.reader(self._fh, delimiter=",")
+        header = next(reader, None)
+        if header is None:
+            self._fh.close()
+            raise ValueError(f"Arquivo {self.path} não tem header reconhecível")
+
+        id_col = choose_column(header, id_cnae_candidates)
+        setor_col = choose_column(header, setor_candidates)
+        if id_col is None or setor_col is None:
+            self._fh.close()
+            raise ValueError(
+                f"Não foi possível localizar colunas ID CNAE/SETOR em {self.path}; encontrados: {header}"
+            )
+        self._rows = self._iter_pairs(
+            reader, header.index(id_col), header.index(setor_col)
+        )
+        self._cur_id, self._cur_setor = next(self._rows, (None, ""))
+        self._last_key = ""
+
+    def _iter_pairs(self, reader, idx_id: int, idx_setor: int):
+        """(id, setor) em ordem, com IDs repetidos colapsados no último valor."""
+        width = max(idx_id, idx_setor) + 1
+        prev_id, prev_setor = None, ""
+        for row in reader:
+            if len(row) < width:
+                continue
+            key = row[idx_id].strip()
+            if not key:
+                continue
+            if prev_id is not None and key != prev_id:
+                if key < prev_id:
+                    raise ValueError(
+                        f"{self.path} não está ordenado por ID CNAE ({key!r} após {prev_id!r})"
+                    )
+                yield prev_id, prev_setor
+            prev_id, prev_setor = key, row[idx_setor].strip()
+        if prev_id is not None:
+            yield prev_id, prev_setor
+
+    def get(self, key: str, default: str = "") -> str:
+        if not key:
+            return default
+        if key < self._last_key:
+            raise ValueError(
+                f"rais não está ordenado por ID CNAE ({key!r} após {self._last_key!r})"
+            )
+        self._last_key = key
+        while self._cur_id is not None and self._cur_id < key:
+            self._cur_id, self._cur_setor = next(self._rows, (None, ""))
+        return self._cur_setor if self._cur_id == key else default
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self) -> "SortedCnaesLookup":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
 # --- Merge streaming --------------------------------------------------------
 
+# Ordem de saída requerida
+OUT_FIELDNAMES = [
+    "Ano",
+    "ID CNAE",
+    "CNAE",
+    "Massa Salarial",
+    "Salário Médio",
+    "Número de empregos",
+    "Ganho de Oportunidade",
+    "SETOR",
+]
+
+
+def resolve_rais_columns(header: List[str]) -> Dict[str, int]:
+    """
+    Localiza no header do rais a posição de cada coluna usada no merge.
+
+    Colunas ausentes são logadas e ficam com posição -1 (campo vazio na saída).
+    """
+    # Mapeamentos de nomes esperados (candidatos) para localizar colunas no rais
+    col_candidates = {
+        "ano": ("Ano", "ano", "ANo", "ANO"),
+        "id_cnae": ("ID CNAE", "id_cnae", "id cnae", "idcnae"),
+        "cnae": ("CNAE", "cnae"),
+        "massa_salarial": ("Massa Salarial", "massa_salarial", "massa salarial"),
+        "salario_medio": (
+            "Salário Médio",
+            "Salario Medio",
+            "salario medio",
+            "salario_medio",
+        ),
+        "num_empregos": (
+            "Número de empregos",
+            "Numero de empregos",
+            "numero de empregos",
+            "numero_de_empregos",
+            "numero_de_empregos",
+        ),
+        "ganho_oportunidade": (
+            "Ganho de Oportunidade",
+            "Ganho de oportunidade",
+            "ganho oportunidade",
+            "ganho_oportunidade",
+        ),
+    }
+
+    # Escolhe as colunas reais presentes no arquivo rais e guarda a posição de cada
+    # uma no header; o loop indexa a lista devolvida pelo csv.reader
+    chosen: Dict[str, int] = {}
+    for key, candidates in col_candidates.items():
+        col = choose_column(header, candidates)
+        if col is None:
+            logger.error(
+                "Coluna esperada não encontrada no rais: %s (candidatos: %s)",
+                key,
+                candidates,
+            )
+            # Não levantamos aqui; permitimos continuidade e usaremos valores vazios
+            # (-1 aponta para o campo vazio acrescentado ao fim de cada linha)
+            chosen[key] = -1
+        else:
+            chosen[key] = header.index(col)
+    return chosen
+
+
+def merge_rows(
+    source: Iterable,
+    chosen: Mapping[str, int],
+    cnaes_map: Mapping[str, str],
+    fd: int,
+    rais_delimiter: str = ";",
+    out_delimiter: str = ";",
+    report_every: int = 100_000,
+    batch_size: int = 65_536,
+    strict_csv: bool = False,
+    multiline: bool = True,
+) -> Tuple[int, int]:
+    """
+    Anexa SETOR às linhas do rais (sem o header) e grava o resultado em `fd`.
+
+    Por padrão `source` são as linhas de texto, quebradas com `str.split`; só as linhas
+    que contêm aspas passam pelo csv.reader, que consome de `source` as linhas de
+    continuação de um campo entre aspas com quebra de linha. Com `multiline=False` (blocos
+    do merge paralelo) esse campo é um erro. Com `strict_csv`, `source` é um csv.reader.
+
+    Retorna `(processadas, escritas)`.
+    """
+    # as linhas são montadas com `join` e gravadas como bytes direto no descritor;
+    # o csv.writer só formata as linhas que precisam de aspas/escape
+    sio = io.StringIO()
+    quoting_writer = csv.writer(sio, delimiter=out_delimiter)
+
+    def quoted_line(fields: Tuple[str, ...]) -> str:
+        sio.seek(0)
+        sio.truncate()
+        quoting_writer.writerow(fields)
+        # sem o "\r\n" final, acrescentado ao gravar o lote
+        return sio.getvalue()[:-2]
+
+    join = out_delimiter.join
+    n_sep = len(OUT_FIELDNAMES) - 1
+
+    ano_i, idc_i, cnae_i, mass_i, sal_i, num_i, gan_i = (
+        chosen[key]
+        for key in (
+            "ano",
+            "id_cnae",
+            "cnae",
+            "massa_salarial",
+            "salario_medio",
+            "num_empregos",
+            "ganho_oportunidade",
+        )
+    )
+    pad = -1 in chosen.values()
+    min_width = max(max(chosen.values()) + 1, 1)
+    cnaes_get = cnaes_map.get
+
+    # linhas de saída (na ordem de `OUT_FIELDNAMES`) são acumuladas e gravadas em
+    # lotes, uma escrita por lote em vez de uma por linha
+    batch = []
+    append = batch.append
+    processed = 0
+    written = 0
+
+    # o mesmo iterador é compartilhado com o csv.reader das linhas com aspas
+    source = iter(source)
+    for item in source:
+        if strict_csv:
+            row = item
+        elif '"' in item:
+            if multiline:
+                row = next(csv.reader(chain([item], source), delimiter=rais_delimiter))
+            else:
+                row = next(csv.reader([item], delimiter=rais_delimiter))
+                # só um campo entre aspas que não fecha na linha guarda o '\n' final
+                if any("\n" in f or "\r" in f for f in row):
+                    raise ValueError(
+                        "Campo entre aspas com quebra de linha no rais; "
+                        "use o merge sem --workers"
+                    )
+        else:
+            row = item.rstrip("\r\n").split(rais_delimiter)
+        if len(row) < min_width:
+            # linha vazia ou truncada
+            continue
+        processed += 1
+        if pad:
+            row.append("")
+
+        id_cnae = row[idc_i].strip()
+        fields = (
+            row[ano_i].strip(),
+            id_cnae,
+            row[cnae_i].strip(),
+            row[mass_i].strip(),
+            row[sal_i].strip(),
+            row[num_i].strip(),
+            row[gan_i].strip(),
+            cnaes_get(id_cnae, ""),
+        )
+        line = join(fields)
+        if (
+            '"' in line
+            or "\n" in line
+            or "\r" in line
+            or line.count(out_delimiter) != n_sep
+        ):
+            line = quoted_line(fields)
+        append(line)
+        written += 1
+
+        if len(batch) >= batch_size:
+            write_all(fd, ("\r\n".join(batch) + "\r\n").encode("utf-8"))
+            batch.clear()
+
+        if processed % report_every == 0:
+            logger.info("Linhas processadas: %d (escritas: %d)", processed, written)
+
+    if batch:
+        write_all(fd, ("\r\n".join(batch) + "\r\n").encode("utf-8"))
+    return processed, written
+
 
 def stream_merge(
     rais_path: Path,
@@ -131,11 +424,17 @@ def stream_merge(
     rais_delimiter: str = ";",
     out_delimiter: str = ";",
     report_every: int = 100_000,
+    batch_size: int = 65_536,
+    strict_csv: bool = False,
 ) -> None:
     """
     Percorre `rais_path` linha-a-linha, anexa a coluna SETOR a partir de `cnaes_map` e grava em `out_path`.
 
-    O arquivo de saída será separado por `out_delimiter`.
+    `cnaes_map` só precisa de `get(id_cnae, default)`: um dict de `load_cnaes_unicos` ou
+    um `SortedCnaesLookup` quando os arquivos estão ordenados por ID CNAE.
+
+    O arquivo de saída será separado por `out_delimiter`; as linhas são gravadas em lotes
+    de até `batch_size`, com o mesmo formato do `csv.writer` (aspas só quando necessário).
     """
     rais_path = Path(rais_path)
     out_path = Path(out_path)
@@ -144,103 +443,182 @@ def stream_merge(
 
     with (
         open_text(rais_path) as rin,
-        out_path.open("w", encoding="utf-8", newline="") as wout,
+        out_path.open("wb", buffering=0) as wout,
     ):
-        reader = csv.DictReader(rin, delimiter=rais_delimiter)
-        if reader.fieldnames is None:
+        reader = csv.reader(rin, delimiter=rais_delimiter)
+        header = next(reader, None)
+        if header is None:
             raise ValueError(f"Arquivo {rais_path} não tem header reconhecível")
 
-        # Mapeamentos de nomes esperados (candidatos) para localizar colunas no rais
-        col_candidates = {
-            "ano": ("Ano", "ano", "ANo", "ANO"),
-            "id_cnae": ("ID CNAE", "id_cnae", "id cnae", "idcnae"),
-            "cnae": ("CNAE", "cnae"),
-            "massa_salarial": ("Massa Salarial", "massa_salarial", "massa salarial"),
-            "salario_medio": (
-                "Salário Médio",
-                "Salario Medio",
-                "salario medio",
-                "salario_medio",
-            ),
-            "num_empregos": (
-                "Número de empregos",
-                "Numero de empregos",
-                "numero de empregos",
-                "numero_de_empregos",
-                "numero_de_empregos",
-            ),
-            "ganho_oportunidade": (
-                "Ganho de Oportunidade",
-                "Ganho de oportunidade",
-                "ganho oportunidade",
-                "ganho_oportunidade",
-            ),
-        }
-
-        # Escolhe as colunas reais presentes no arquivo rais
-        chosen: Dict[str, str] = {}
-        for key, candidates in col_candidates.items():
-            col = choose_column(reader.fieldnames, candidates)
-            if col is None:
-                logger.error(
-                    "Coluna esperada não encontrada no rais: %s (candidatos: %s)",
-                    key,
-                    candidates,
-                )
-                # Não levantamos aqui; permitimos continuidade e usaremos valores vazios
-                chosen[key] = None  # type: ignore
-            else:
-                chosen[key] = col
-
-        # Ordem de saída requerida
-        out_fieldnames = [
-            "Ano",
-            "ID CNAE",
-            "CNAE",
-            "Massa Salarial",
-            "Salário Médio",
-            "Número de empregos",
-            "Ganho de Oportunidade",
-            "SETOR",
-        ]
+        chosen = resolve_rais_columns(header)
+        fd = wout.fileno()
+        write_all(fd, (out_delimiter.join(OUT_FIELDNAMES) + "\r\n").encode("utf-8"))
+        # o csv.reader só consumiu o header; no modo padrão o restante é lido por linha
+        processed, written = merge_rows(
+            reader if strict_csv else rin,
+            chosen,
+            cnaes_map,
+            fd,
+            rais_delimiter=rais_delimiter,
+            out_delimiter=out_delimiter,
+            report_every=report_every,
+            batch_size=batch_size,
+            strict_csv=strict_csv,
+        )
+
+    logger.info(
+        "Merge concluído. Linhas processadas: %d, escritas: %d", processed, written
+    )
+
+
+# --- Merge paralelo ---------------------------------------------------------
+
+# estado de cada processo do pool, preenchido uma vez por `_init_worker`
+_worker_state: Dict[str, object] = {}
+
+
+def _init_worker(
+    cnaes_map: Mapping[str, str],
+    chosen: Mapping[str, int],
+    encoding: str,
+    rais_delimiter: str,
+    out_delimiter: str,
+    batch_size: int,
+) -> None:
+    _worker_state.update(
+        cnaes_map=cnaes_map,
+        chosen=chosen,
+        encoding=encoding,
+        rais_delimiter=rais_delimiter,
+        out_delimiter=out_delimiter,
+        batch_size=batch_size,
+    )
 
-        writer = csv.DictWriter(
-            wout, fieldnames=out_fieldnames, delimiter=out_delimiter
+
+def _merge_chunk(task: Tuple[str, int, int, str]) -> Tuple[int, int]:
+    """Faz o merge das linhas entre os bytes `start` e `end` do rais em `part_path`."""
+    rais_path, start, end, part_path = task
+    st = _worker_state
+    # o bloco é decodificado direto das páginas mapeadas, sem copiar antes para bytes
+    with (
+        open(rais_path, "rb") as fh,
+        mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        if hasattr(mm, "madvise"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        with memoryview(mm)[start:end] as view:
+            text = str(view, st["encoding"])
+    # newline="" mantém os finais de linha intactos, como em open_text
+    lines = io.StringIO(text, newline="")
+    del text
+    with open(part_path, "wb", buffering=0) as out:
+        return merge_rows(
+            lines,
+            st["chosen"],
+            st["cnaes_map"],
+            out.fileno(),
+            rais_delimiter=st["rais_delimiter"],
+            out_delimiter=st["out_delimiter"],
+            # o progresso é logado pelo processo principal, por bloco
+            report_every=sys.maxsize,
+            batch_size=st["batch_size"],
+            # um campo com quebra de linha pode atravessar o fim do bloco
+            multiline=False,
         )
-        writer.writeheader()
 
-        processed = 0
-        written = 0
 
-        for row in reader:
-            processed += 1
-
-            # Extrai campos com tolerância à ausência
-            def get_col(name_key: str) -> str:
-                colname = chosen.get(name_key)
-                if not colname:
-                    return ""
-                return row.get(colname, "").strip()
-
-            id_cnae = get_col("id_cnae")
-            setor = cnaes_map.get(id_cnae, "") if id_cnae else ""
-
-            out_row = {
-                "Ano": get_col("ano"),
-                "ID CNAE": id_cnae,
-                "CNAE": get_col("cnae"),
-                "Massa Salarial": get_col("massa_salarial"),
-                "Salário Médio": get_col("salario_medio"),
-                "Número de empregos": get_col("num_empregos"),
-                "Ganho de Oportunidade": get_col("ganho_oportunidade"),
-                "SETOR": setor,
-            }
-
-            writer.writerow(out_row)
-            written += 1
-
-            if processed % report_every == 0:
-                logger.info("Linhas processadas: %d (escritas: %d)", processed, written)
+def chunk_offsets(path: Path, start: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """Divide `path` a partir de `start` em faixas de ~`chunk_bytes` que terminam em '\\n'."""
+    size = path.stat().st_size
+    ranges = []
+    if start >= size:
+        return ranges
+    with (
+        path.open("rb") as fh,
+        mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        while start < size:
+            nl = mm.find(b"\n", min(start + chunk_bytes, size - 1))
+            end = size if nl == -1 else nl + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parallel_merge(
+    rais_path: Path,
+    cnaes_map: Mapping[str, str],
+    out_path: Path,
+    workers: int,
+    rais_delimiter: str = ";",
+    out_delimiter: str = ";",
+    chunk_bytes: int = 32 << 20,
+    batch_size: int = 65_536,
+) -> None:
+    """
+    Como `stream_merge`, mas divide o rais em blocos de ~`chunk_bytes` (alinhados em fim
+    de linha) processados por `workers` processos; cada bloco vira um arquivo parcial, e
+    as partes são concatenadas em ordem no final, então a saída é idêntica.
+
+    O corte por bytes pressupõe que nenhum campo do rais contém quebra de linha.
+    """
+    rais_path = Path(rais_path)
+    out_path = Path(out_path)
+
+    logger.info(
+        "Iniciando merge paralelo (%d processos): %s -> %s",
+        workers,
+        rais_path,
+        out_path,
+    )
+
+    with open_text(rais_path) as rin:
+        header = next(csv.reader([rin.readline()], delimiter=rais_delimiter), None)
+        # o BOM só existe no início do arquivo, que fica com o processo principal
+        encoding = "utf-8" if rin.encoding == "utf-8-sig" else rin.encoding
+    if header is None:
+        raise ValueError(f"Arquivo {rais_path} não tem header reconhecível")
+    chosen = resolve_rais_columns(header)
+
+    with rais_path.open("rb") as fh:
+        fh.readline()
+        body_start = fh.tell()
+    ranges = chunk_offsets(rais_path, body_start, chunk_bytes)
+
+    processed = written = 0
+    with TemporaryDirectory(dir=out_path.parent, prefix=".merge_parts_") as tmp:
+        parts = [str(Path(tmp) / f"part_{i:05d}.csv") for i in range(len(ranges))]
+        tasks = [
+            (str(rais_path), start, end, part)
+            for (start, end), part in zip(ranges, parts)
+        ]
+        with Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(
+                cnaes_map,
+                chosen,
+                encoding,
+                rais_delimiter,
+                out_delimiter,
+                batch_size,
+            ),
+        ) as pool:
+            for done, (p, w) in enumerate(pool.imap(_merge_chunk, tasks), 1):
+                processed += p
+                written += w
+                logger.info(
+                    "Blocos concluídos: %d/%d; linhas processadas: %d",
+                    done,
+                    len(tasks),
+                    processed,
+                )
+
+        with out_path.open("wb") as wout:
+            wout.write((out_delimiter.join(OUT_FIELDNAMES) + "\r\n").encode("utf-8"))
+            for part in parts:
+                with open(part, "rb") as pin:
+                    shutil.copyfileobj(pin, wout, IO_BUFFER_SIZE)
 
     logger.info(
         "Merge concluído. Linhas processadas: %d, escritas: %d", processed, written
@@ -270,6 +648,22 @@ def parse_args() -> argparse.Namespace:
         default=100_000,
         help="Frequência de log em linhas (default: 100000)",
     )
+    p.add_argument(
+        "--sorted",
+        action="store_true",
+        help="rais e cnaes_unicos já estão ordenados por ID CNAE: faz sort-merge join sem carregar o mapa em memória",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos para o merge (default: 1); com mais de 1, o rais é dividido em blocos processados em paralelo",
+    )
+    p.add_argument(
+        "--strict-csv",
+        action="store_true",
+        help="Lê todas as linhas do rais com o csv.reader, sem o atalho por split",
+    )
 
     return p.parse_args()
 
@@ -288,7 +682,38 @@ def main() -> None:
         logger.error("Arquivo cnaes_unicos não encontrado: %s", cnaes_path)
         raise SystemExit(1)
 
+    if args.sorted and args.workers > 1:
+        logger.error("--sorted e --workers > 1 não podem ser usados juntos")
+        raise SystemExit(1)
+    if args.strict_csv and args.workers > 1:
+        logger.error("--strict-csv e --workers > 1 não podem ser usados juntos")
+        raise SystemExit(1)
+
+    if args.sorted:
+        with SortedCnaesLookup(cnaes_path) as cnaes_lookup:
+            stream_merge(
+                rais_path,
+                cnaes_lookup,
+                out_path,
+                rais_delimiter=";",
+                out_delimiter=";",
+                report_every=args.report_every,
+                strict_csv=args.strict_csv,
+            )
+        return
+
     cnaes_map = load_cnaes_unicos(cnaes_path)
+    if args.workers > 1:
+        parallel_merge(
+            rais_path,
+            cnaes_map,
+            out_path,
+            workers=args.workers,
+            rais_delimiter=";",
+            out_delimiter=";",
+        )
+        return
+
     stream_merge(
         rais_path,
         cnaes_map,
@@ -296,6 +721,7 @@ def main() -> None:
         rais_delimiter=";",
         out_delimiter=";",
         report_every=args.report_every,
+        strict_csv=args.strict_csv,
     )
 
 
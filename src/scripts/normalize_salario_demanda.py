@@ -13,11 +13,15 @@ O script é tolerante a formatos numéricos (vírgula/ponto) e preserva o separa
 from __future__ import annotations
 
 import argparse
+import codecs
 import csv
+import io
 import logging
 import sys
 from pathlib import Path
-from typing import Optional
+
+import numpy as np
+import pandas as pd
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,36 +30,76 @@ logging.basicConfig(
 )
 logger = logging.getLogger("normalize_salario_demanda")
 
+# buffer de E/S (1 MiB) em vez dos 8 KiB padrão: menos syscalls em arquivos grandes
+IO_BUFFER_SIZE = 1 << 20
+
 
 def open_text(path: Path, encoding: str = "utf-8"):
+    # `open()` não decodifica nada (o UnicodeDecodeError só apareceria no meio da
+    # leitura), então o encoding é decidido antes, validando o início do arquivo
+    fh = path.open("rb", buffering=IO_BUFFER_SIZE)
+    sample = fh.read(65536)
+    fh.seek(0)
     try:
-        return path.open("r", encoding=encoding, newline="")
+        # final=False: um caractere cortado no fim da amostra não conta como erro
+        codecs.getincrementaldecoder(encoding)().decode(sample)
     except UnicodeDecodeError:
         logger.warning("Falha ao abrir %s com %s; tentando latin-1", path, encoding)
-        return path.open("r", encoding="latin-1", newline="")
-
-
-def parse_decimal(value: Optional[str]) -> float:
-    if value is None:
-        return 0.0
-    s = str(value).strip()
-    if s == "":
-        return 0.0
-    s = s.replace('"', "")
-    try:
-        return float(s)
-    except ValueError:
-        try:
-            return float(s.replace(".", "").replace(",", "."))
-        except Exception:
-            logger.debug("Não foi possível converter para float: %s", value)
-            return 0.0
-
-
-def normalize(value: float, minv: float, maxv: float) -> float:
-    if maxv == minv:
-        return 0.0
-    return (value - minv) / (maxv - minv)
+        encoding = "latin-1"
+    else:
+        if encoding == "utf-8" and sample.startswith(codecs.BOM_UTF8):
+            encoding = "utf-8-sig"
+    return io.TextIOWrapper(fh, encoding=encoding, newline="")
+
+
+def parse_decimal_series(values: pd.Series) -> pd.Series:
+    """Converte uma coluna de texto para float (ponto ou vírgula decimal, aspas, milhar).
+
+    Vazios e valores que não puderem ser convertidos viram 0.0.
+
+    O caso comum (ponto decimal, com ou sem espaços ao redor) é convertido direto pelo
+    parser em C do `pd.to_numeric`; `strip`/aspas/milhar só passam pelos métodos `.str`
+    nas linhas em que essa conversão falhou.
+    """
+    num = pd.to_numeric(values, errors="coerce")
+    failed = num.isna()
+    if failed.any():
+        s = values[failed].str.strip().str.replace('"', "", regex=False)
+        retry = pd.to_numeric(s, errors="coerce")
+        still = retry.isna()
+        # tenta remover separadores de milhar (pontos) e trocar vírgula por ponto
+        retry[still] = pd.to_numeric(
+            s[still]
+            .str.replace(".", "", regex=False)
+            .str.replace(",", ".", regex=False),
+            errors="coerce",
+        )
+        num[failed] = retry
+    return num.fillna(0.0)
+
+
+def normalize_by_code(
+    values: np.ndarray, codes: np.ndarray, n_codes: int
+) -> np.ndarray:
+    """
+    Min-max de `values` dentro de cada grupo, dado o código inteiro do grupo de cada
+    linha (`codes`, -1 = sem grupo); 0.0 quando min == max ou sem grupo.
+
+    Os extremos ficam em arrays indexados pelo código, iniciados em +inf/-inf, então
+    não há caso especial para o primeiro valor de cada grupo.
+    """
+    minv = np.full(n_codes, np.inf)
+    maxv = np.full(n_codes, -np.inf)
+    valid = codes >= 0
+    np.minimum.at(minv, codes[valid], values[valid])
+    np.maximum.at(maxv, codes[valid], values[valid])
+
+    lo = minv[codes]
+    rng = maxv[codes] - lo
+    ok = valid & (rng != 0)
+    out = np.zeros(len(values))
+    out[ok] = (values[ok] - lo[ok]) / rng[ok]
+    return out
 
 
 def process(
@@ -63,108 +107,89 @@ def process(
     out_path: Path,
     demanda_col_candidates=("demanda", "Demanda"),
     salario_col_candidates=("salario_mediana", "salario_medio", "salario_mediana"),
-):
-    logger.info("Lendo arquivo: %s", in_path)
-    # primeira passada: determinar min/max por setor (streaming, sem manter todas as linhas)
-    min_dem_by_sector: dict = {}
-    max_dem_by_sector: dict = {}
-    min_sal_by_sector: dict = {}
-    max_sal_by_sector: dict = {}
+) -> pd.DataFrame:
+    """
+    Grava em `out_path` o CSV de entrada com as duas colunas normalizadas.
 
-    # detecta colunas reais
+    Retorna as mesmas colunas já tipadas (float64 nas numéricas), para a cópia Parquet
+    ser gravada sem reler o CSV.
+    """
+    logger.info("Lendo arquivo: %s", in_path)
+    # leitura única como texto: as colunas originais são regravadas exatamente como vieram
     with open_text(in_path) as fh:
-        reader = csv.DictReader(fh, delimiter=";")
-        if reader.fieldnames is None:
-            raise ValueError("Arquivo sem header reconhecível")
-
-        def choose(fieldnames, candidates):
-            norm = {c.strip().lower(): c for c in fieldnames}
-            for cand in candidates:
-                v = norm.get(cand.strip().lower())
-                if v:
-                    return v
-            return None
-
-        ano_field = choose(reader.fieldnames, ("ano",))
-        setor_field = choose(reader.fieldnames, ("setor",))
-        demanda_col = choose(reader.fieldnames, demanda_col_candidates)
-        salario_col = choose(reader.fieldnames, salario_col_candidates)
-
-        if demanda_col is None or salario_col is None or setor_field is None:
-            logger.error(
-                "Colunas esperadas não encontradas. Header: %s", reader.fieldnames
-            )
-            raise SystemExit(1)
-
-        processed = 0
-        for row in reader:
-            processed += 1
-            setor = (row.get(setor_field) or "").strip()
-            if not setor:
-                continue
-            dem = parse_decimal(row.get(demanda_col))
-            sal = parse_decimal(row.get(salario_col))
-
-            # demanda
-            prev_min = min_dem_by_sector.get(setor)
-            prev_max = max_dem_by_sector.get(setor)
-            if prev_min is None or dem < prev_min:
-                min_dem_by_sector[setor] = dem
-            if prev_max is None or dem > prev_max:
-                max_dem_by_sector[setor] = dem
-
-            # salario
-            prev_min_s = min_sal_by_sector.get(setor)
-            prev_max_s = max_sal_by_sector.get(setor)
-            if prev_min_s is None or sal < prev_min_s:
-                min_sal_by_sector[setor] = sal
-            if prev_max_s is None or sal > prev_max_s:
-                max_sal_by_sector[setor] = sal
-
-            if processed % 500_000 == 0:
-                logger.info(
-                    "Primeira passada: linhas processadas: %d; setores encontrados: %d",
-                    processed,
-                    len(min_dem_by_sector),
-                )
-
-    logger.info("Min/max por setor calculados. Setores: %d", len(min_dem_by_sector))
-
-    # segunda passada: reabre e escreve arquivo com colunas extras
-    with (
-        open_text(in_path) as fh_in,
-        out_path.open("w", encoding="utf-8", newline="") as fh_out,
-    ):
-        reader2 = csv.DictReader(fh_in, delimiter=";")
-        out_fieldnames = list(reader2.fieldnames) + [
-            "demanda_normalizada",
-            "salario_mediana_normalizado",
-        ]
-        writer = csv.DictWriter(fh_out, fieldnames=out_fieldnames, delimiter=";")
-        writer.writeheader()
-
-        processed = 0
-        for row in reader2:
-            processed += 1
-            setor = (row.get(setor_field) or "").strip()
-            dem = parse_decimal(row.get(demanda_col))
-            sal = parse_decimal(row.get(salario_col))
-
-            min_dem = min_dem_by_sector.get(setor, 0.0)
-            max_dem = max_dem_by_sector.get(setor, min_dem)
-            min_sal = min_sal_by_sector.get(setor, 0.0)
-            max_sal = max_sal_by_sector.get(setor, min_sal)
-
-            row["demanda_normalizada"] = f"{normalize(dem, min_dem, max_dem):.6f}"
-            row["salario_mediana_normalizado"] = (
-                f"{normalize(sal, min_sal, max_sal):.6f}"
-            )
-            writer.writerow(row)
-
-            if processed % 500_000 == 0:
-                logger.info("Segunda passada: linhas processadas: %d", processed)
-
-    logger.info("Arquivo salvo: %s", out_path)
+        try:
+            df = pd.read_csv(fh, sep=";", dtype=object, keep_default_na=False)
+        except pd.errors.EmptyDataError:
+            raise ValueError("Arquivo sem header reconhecível") from None
+
+    def choose(fieldnames, candidates):
+        norm = {c.strip().lower(): c for c in fieldnames}
+        for cand in candidates:
+            v = norm.get(cand.strip().lower())
+            if v:
+                return v
+        return None
+
+    setor_field = choose(df.columns, ("setor",))
+    demanda_col = choose(df.columns, demanda_col_candidates)
+    salario_col = choose(df.columns, salario_col_candidates)
+
+    if demanda_col is None or salario_col is None or setor_field is None:
+        logger.error("Colunas esperadas não encontradas. Header: %s", list(df.columns))
+        raise SystemExit(1)
+
+    # setor -> código inteiro, calculado uma vez e compartilhado pelas duas colunas;
+    # linhas com setor em branco ficam com código -1 (e recebem 0.0)
+    setor = df[setor_field].str.strip()
+    codes, setores = pd.factorize(setor.where(setor != ""))
+    dem = parse_decimal_series(df[demanda_col]).to_numpy()
+    sal = parse_decimal_series(df[salario_col]).to_numpy()
+    dem_norm = normalize_by_code(dem, codes, len(setores))
+    sal_norm = normalize_by_code(sal, codes, len(setores))
+    logger.info("Min/max por setor calculados. Setores: %d", len(setores))
+
+    dem_txt = list(map("{:.6f}".format, dem_norm.tolist()))
+    sal_txt = list(map("{:.6f}".format, sal_norm.tolist()))
+    df["demanda_normalizada"] = dem_txt
+    df["salario_mediana_normalizado"] = sal_txt
+
+    with out_path.open(
+        "w", encoding="utf-8", newline="", buffering=IO_BUFFER_SIZE
+    ) as fh_out:
+        writer = csv.writer(fh_out, delimiter=";")
+        writer.writerow(df.columns)
+        writer.writerows(df.to_numpy().tolist())
+
+    logger.info("Arquivo salvo: %s (linhas: %d)", out_path, len(df))
+
+    # ano e setor ficam como texto (vazio = ausente); as demais colunas viram float64 com
+    # a mesma regra do dashboard ao ler o CSV (pd.to_numeric, células não numéricas viram
+    # NaN), então as duas cópias mostram os mesmos dados; as normalizadas têm o
+    # arredondamento do CSV
+    text_cols = {setor_field, choose(df.columns, ("ano",))}
+    typed = {
+        col: (
+            df[col].where(df[col] != "")
+            if col in text_cols
+            else pd.to_numeric(df[col], errors="coerce").astype("float64")
+        )
+        for col in df.columns
+    }
+    typed["demanda_normalizada"] = np.array(dem_txt, dtype=np.float64)
+    typed["salario_mediana_normalizado"] = np.array(sal_txt, dtype=np.float64)
+    return pd.DataFrame(typed, index=df.index)
+
+
+def write_parquet(df: pd.DataFrame, csv_path: Path) -> Path:
+    """Grava `df` (retornado por `process`) ao lado de `csv_path`, com extensão .parquet.
+
+    O dashboard prefere essa cópia quando ela é mais nova que o CSV: os tipos ficam
+    preservados e a leitura dispensa o parse do texto.
+    """
+    parquet_path = csv_path.with_suffix(".parquet")
+    df.to_parquet(parquet_path, engine="pyarrow", compression="zstd", index=False)
+    logger.info("Cópia Parquet salva: %s", parquet_path)
+    return parquet_path
 
 
 def parse_args():
@@ -175,6 +200,11 @@ def parse_args():
         "--in", required=True, dest="infile", help="Arquivo de entrada (separador ;)"
     )
     p.add_argument("--out", required=True, help="Arquivo de saída (separador ;)")
+    p.add_argument(
+        "--parquet",
+        action="store_true",
+        help="Grava também uma cópia .parquet da saída (lida preferencialmente pelo dashboard)",
+    )
     return p.parse_args()
 
 
@@ -185,7 +215,9 @@ def main():
     if not in_path.exists():
         logger.error("Arquivo não encontrado: %s", in_path)
         raise SystemExit(1)
-    process(in_path, out_path)
+    df = process(in_path, out_path)
+    if args.parquet:
+        write_parquet(df, out_path)
 
 
 if __name__ == "__main__":